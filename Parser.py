@@ -1,4 +1,4 @@
-from Scanner import tokens, lexer  # Import tokens from the lexer
+from Scanner import tokens, lexer, tokenize  # Import tokens from the lexer
 import ply.yacc as yacc  # Import PLY's yacc module for parsing
 import json  # For print the AST in the terminal
 import sys   # For error handling and exit
@@ -242,47 +242,66 @@ def find_column(p):
     return 0
         
 # Main function to initiate parsing
-def main():
+# filename: source file to parse
+# quiet: when True, progress and error messages are not printed (the caller reports them)
+# report: optional instrumentation.MemoryReport, scanning and parsing are then measured as separate phases
+# data: source text already read by the caller, filename is then only used in messages
+def main(filename='Program_Test.txt', quiet=False, report=None, data=None):
     global parser
     
     # Clear any previous errors
     syntax_errors.clear()
     
-    print("-----------------------------------------------------\nInitiating Parsing...")
+    if not quiet:
+        print("-----------------------------------------------------\nInitiating Parsing...")
 
     # Create parser with error recovery
     parser = yacc.yacc(debug=False, errorlog=yacc.NullLogger())
 
     try:
-        with open('Program_Test.txt', 'r') as textFile:
-            data = textFile.read()
+        if data is None:
+            with open(filename, 'r') as textFile:
+                data = textFile.read()
 
-        # Reset lexer for a clean start with proper line counting
-        lexer.lineno = 1
-        
-        # Parse the data
-        ast = parser.parse(data, lexer=lexer)
+        if report is None:
+            # Reset lexer for a clean start with proper line counting
+            lexer.lineno = 1
+            
+            # Parse the data
+            ast = parser.parse(data, lexer=lexer)
+        else:
+            # Scan the whole token stream first so its memory is measured on its own
+            with report.phase('scan'):
+                token_list = tokenize(data)
+            report.extra['tokens'] = report.extra.get('tokens', 0) + len(token_list)
+            
+            # Parse from the token list
+            with report.phase('parse'):
+                token_iter = iter(token_list)
+                ast = parser.parse(lexer=lexer, tokenfunc=lambda: next(token_iter, None))
         
         # Combine lexical and syntax errors, ensure they're sorted by line number
         all_errors = lexical_errors + syntax_errors
         sorted_errors = sorted(all_errors, key=lambda x: x[0])
         
         if sorted_errors:
-            print("\nParsing completed with errors:")
-            for line, col, msg in sorted_errors:
-                # For EOF errors, don't show the high line number
-                if line == 999:
-                    print(f"- {msg}")
-                else:
-                    print(f"- {msg}")
-            print(f"\n\033[91m\nAST was not fully constructed due to errors.\033[0m")        
+            if not quiet:
+                print("\nParsing completed with errors:")
+                for line, col, msg in sorted_errors:
+                    # For EOF errors, don't show the high line number
+                    if line == 999:
+                        print(f"- {msg}")
+                    else:
+                        print(f"- {msg}")
+                print(f"\n\033[91m\nAST was not fully constructed due to errors.\033[0m")        
             return None
         else:
-            print("Finalizing Parsing without any errors.")
+            if not quiet:
+                print("Finalizing Parsing without any errors.")
             return ast
             
     except Exception as e:
-        print(f"Error during parsing: {str(e)}")
+        print(f"Error during parsing: {str(e)}", file=sys.stderr if quiet else sys.stdout)
         return None
 
 # Run the main function
@@ -147,6 +147,18 @@ def find_column(token):
 # Build the lexer with line tracking enabled
 lexer = lex.lex()
 
+# Scans the whole input and returns the list of tokens
+def tokenize(data):
+    lexer.input(data)
+    lexer.lineno = 1
+    token_list = []
+    while True:
+        tok = lexer.token()
+        if not tok:
+            break
+        token_list.append(tok)
+    return token_list
+
 # Only execute this part when running scanner directly
 if __name__ == "__main__":
     # Clear any previous errors
@@ -0,0 +1,108 @@
+import sys
+import tracemalloc
+from contextlib import contextmanager
+
+# Opt-in memory instrumentation for the scan, parse and interpret phases
+class MemoryReport:
+    def __init__(self):
+        self.phases = {}     # Phase name -> {'peak': bytes, 'retained': bytes}
+        self.ast = None      # AST node counts and sizes, see ast_stats()
+        self.env = None      # Environment copies recorded by the interpreter
+        self.extra = {}      # Other figures attached by a phase (e.g. token count)
+
+    @contextmanager
+    def phase(self, name):
+        """Records the peak and retained memory of the code run inside the block.
+        A phase run several times (once per unit) keeps the highest peak and the total retained"""
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        try:
+            yield
+        finally:
+            after, peak = tracemalloc.get_traced_memory()
+            stats = self.phases.setdefault(name, {'peak': 0, 'retained': 0})
+            stats['peak'] = max(stats['peak'], peak - before)
+            stats['retained'] += after - before
+            if started:
+                tracemalloc.stop()
+
+    def to_dict(self):
+        """Returns the report as a JSON serializable dict"""
+        return {
+            'phases': self.phases,
+            'ast': self.ast,
+            'environments': self.env,
+            'extra': self.extra
+        }
+
+    def format(self):
+        """Returns the report as readable text"""
+        lines = ["-----------------------------------------------------", "Memory Report"]
+        lines.append(f"{'Phase':<12}{'Peak (bytes)':>16}{'Retained (bytes)':>20}")
+        for name, stats in self.phases.items():
+            lines.append(f"{name:<12}{stats['peak']:>16}{stats['retained']:>20}")
+        for name, value in self.extra.items():
+            lines.append(f"{name}: {value}")
+
+        if self.ast:
+            lines.append(f"\nAST: {self.ast['nodes']} nodes, ~{self.ast['bytes']} bytes")
+            lines.append(f"{'Node type':<16}{'Count':>10}{'Bytes':>12}")
+            by_type = sorted(self.ast['by_type'].items(), key=lambda item: item[1]['bytes'], reverse=True)
+            for node_type, stats in by_type:
+                lines.append(f"{node_type:<16}{stats['count']:>10}{stats['bytes']:>12}")
+
+        if self.env:
+            lines.append("\nEnvironment copies")
+            lines.append(f"{'Site':<16}{'Copies':>10}{'Bytes':>12}{'Peak entries':>14}")
+            for site, stats in self.env.items():
+                lines.append(f"{site:<16}{stats['copies']:>10}{stats['bytes']:>12}{stats['peak_entries']:>14}")
+        lines.append("-----------------------------------------------------")
+        return "\n".join(lines)
+
+def ast_stats(ast):
+    """Counts AST nodes and their approximate size by node type.
+    Sizes are shallow (sys.getsizeof) and include the node's lists and leaf values.
+    The program root is counted as 'program' and the facts maps (name -> fact, at the
+    root and in let blocks) as 'facts', their keys are names and never read as node fields"""
+    by_type = {}
+    nodes = 0
+    total = 0
+    # Iterative walk, deep ASTs would overflow the stack with recursion
+    pending = [('program', ast)]
+    while pending:
+        kind, item = pending.pop()
+        size = sys.getsizeof(item)
+
+        if kind == 'program':
+            if 'facts' in item:
+                pending.append(('facts', item['facts']))
+            if 'stm' in item:
+                pending.append(('node', item['stm']))
+            node_type = 'program'
+
+        elif kind == 'facts':
+            pending.extend(('node', fact) for fact in item.values())
+            node_type = 'facts'
+
+        else:
+            node_type = item['type']
+            for key, value in item.items():
+                if node_type == 'stm_let' and key == 'facts':
+                    pending.append(('facts', value))
+                elif isinstance(value, dict):
+                    pending.append(('node', value))
+                elif isinstance(value, list):
+                    size += sys.getsizeof(value)
+                    pending.extend(('node', child) for child in value if isinstance(child, dict))
+                elif not isinstance(value, (bool, type(None))):
+                    size += sys.getsizeof(value)
+
+        stats = by_type.setdefault(node_type, {'count': 0, 'bytes': 0})
+        stats['count'] += 1
+        stats['bytes'] += size
+        nodes += 1
+        total += size
+    return {'nodes': nodes, 'bytes': total, 'by_type': by_type}
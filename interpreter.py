@@ -1,20 +1,124 @@
+import sys
+import time
+
+# Raised when a run goes over one of its execution budgets
+class ExecutionLimitError(Exception):
+    def __init__(self, limit, message, profile):
+        self.limit = limit      # Which budget was hit: 'steps', 'depth', 'time' or 'memory'
+        self.message = message
+        self.profile = profile  # Partial profile of the run up to the point it was stopped
+        super().__init__(self.message)
+
+# Wall time is only checked once every this many steps (must be a power of two minus one)
+TIME_CHECK_MASK = 1023
+
 # Simple interpreter for the language
 class Interpreter:
-    def __init__(self):
+    # Budgets are optional, None means unlimited
+    # Steps, calls per function and allocated bytes are only counted when a budget is set
+    # max_steps: number of evaluated statements
+    # max_depth: nesting of function calls
+    # max_time: wall time in seconds
+    # max_memory: approximate bytes of arithmetic results, environment copies and argument bindings
+    # track_env: when True, environment copies are counted in env_stats
+    def __init__(self, max_steps=None, max_depth=None, max_time=None, max_memory=None, track_env=False):
         self.global_env = {}  # Global environment for variables and functions
+        self.env_stats = {} if track_env else None  # Site -> copies, bytes and peak entries
+        self.runtime_errors = []  # Errors found while evaluating, the caller reports them
+        self.max_steps = max_steps
+        self.max_depth = max_depth
+        self.max_time = max_time
+        self.max_memory = max_memory
+        self.limited = any(limit is not None for limit in (max_steps, max_depth, max_time, max_memory))
+        # Calls and let blocks only do any bookkeeping when the run has budgets or instrumentation
+        self.metered = self.limited or track_env
+        self.reset_counters()
+    
+    def reset_counters(self):
+        """Resets the budget counters before a run"""
+        self.steps = 0
+        self.depth = 0
+        self.peak_depth = 0
+        self.allocated = 0
+        self.calls = {}  # Number of calls per function name
+        self.start_time = time.perf_counter()
+        # Unlimited budgets become infinity so the checks are a single comparison
+        self.step_limit = self.max_steps if self.max_steps is not None else float('inf')
+        self.depth_limit = self.max_depth if self.max_depth is not None else float('inf')
+    
+    def profile(self):
+        """Returns the counters of the current run"""
+        return {
+            'steps': self.steps,
+            'depth': self.depth,
+            'peak_depth': self.peak_depth,
+            'elapsed': time.perf_counter() - self.start_time,
+            'allocated_bytes': self.allocated,
+            'calls': dict(self.calls)
+        }
+    
+    def runtime_error(self, message):
+        """Records a runtime error, evaluation goes on with None as the value"""
+        self.runtime_errors.append(message)
+    
+    def record_env_copy(self, site, env):
+        """Counts an environment copy made by a let block or a function call"""
+        stats = self.env_stats.setdefault(site, {'copies': 0, 'bytes': 0, 'peak_entries': 0})
+        stats['copies'] += 1
+        stats['bytes'] += sys.getsizeof(env)
+        if len(env) > stats['peak_entries']:
+            stats['peak_entries'] = len(env)
+    
+    def enter_call(self, func_name, old_env):
+        """Counts a function call against the budgets and in env_stats"""
+        if self.env_stats is not None:
+            self.record_env_copy('function_call', old_env)
+        if not self.limited:
+            return
+        
+        # Depth budget
+        self.depth += 1
+        if self.depth > self.peak_depth:
+            self.peak_depth = self.depth
+            if self.depth > self.depth_limit:
+                self.limit_exceeded('depth', f"Call depth limit of {self.max_depth} exceeded in {func_name}")
+        self.calls[func_name] = self.calls.get(func_name, 0) + 1
+        if self.max_memory is not None:
+            self.allocate(sys.getsizeof(old_env))
+    
+    def allocate_bindings(self, new_env):
+        """Counts the parameter environment and the wrapper nodes built for each argument"""
+        size = sys.getsizeof(new_env)
+        for binding in new_env.values():
+            size += sys.getsizeof(binding) + sys.getsizeof(binding['stm'])
+        self.allocate(size)
+    
+    def limit_exceeded(self, limit, message):
+        """Stops the run with a limit error carrying the partial profile"""
+        raise ExecutionLimitError(limit, message, self.profile())
     
     def interpret(self, ast):
         """Main entry point of the interpreter"""
         if not ast:
             return None
         
+        self.reset_counters()
+        self.runtime_errors = []
+        
         # Initialize the global environment with "facts" (variables and functions)
         if 'facts' in ast:
             self.global_env = ast['facts']
         
         # If there is a statement to execute
         if 'stm' in ast:
-            return self.eval_statement(ast['stm'])
+            try:
+                return self.eval_statement(ast['stm'])
+            except RecursionError:
+                # Python ran out of stack before max_depth was reached (the depth is only
+                # known when the run has budgets). Raised from None so the error does not
+                # keep the whole RecursionError traceback, and its environments, alive
+                error = ExecutionLimitError('depth', "Maximum call depth exceeded", self.profile())
+            raise error from None
         return None
     
     def eval_statement(self, stm):
@@ -22,6 +126,10 @@ class Interpreter:
         if not stm:
             return None
         
+        # Steps are only counted when the run has budgets
+        if self.limited:
+            self.count_step()
+        
         stm_type = stm.get('type')
         
         # Literal values (numbers, strings, booleans, nil)
@@ -52,7 +160,7 @@ class Interpreter:
         elif stm_type == 'id_func':
             return stm['id_func']
         
-        print(f"ERROR: Unknown statement type: {stm_type}")
+        self.runtime_error(f"Unknown statement type: {stm_type}")
         return None
     
     def eval_identifier(self, stm):
@@ -65,9 +173,24 @@ class Interpreter:
             if val_node.get('type') == 'val':
                 return self.eval_statement(val_node.get('stm'))
         
-        print(f"ERROR: Undefined identifier: {identifier}")
+        self.runtime_error(f"Undefined identifier: {identifier}")
         return None
     
+    def count_step(self):
+        """Counts one evaluation step, wall time is only checked every TIME_CHECK_MASK + 1 steps"""
+        self.steps += 1
+        if self.steps > self.step_limit:
+            self.limit_exceeded('steps', f"Step limit of {self.max_steps} exceeded")
+        if self.max_time is not None and not self.steps & TIME_CHECK_MASK:
+            if time.perf_counter() - self.start_time > self.max_time:
+                self.limit_exceeded('time', f"Time limit of {self.max_time}s exceeded")
+    
+    def allocate(self, size):
+        """Counts size bytes against the memory budget, only called when max_memory is set"""
+        self.allocated += size
+        if self.allocated > self.max_memory:
+            self.limit_exceeded('memory', f"Memory limit of {self.max_memory} bytes exceeded")
+    
     def eval_operation(self, stm):
         """Evaluates a binary operation"""
         op = stm['op']
@@ -78,33 +201,37 @@ class Interpreter:
         if op == '+':
             # Integers or floats
             if isinstance(left_value, (int, float)) and isinstance(right_value, (int, float)):
-                return left_value + right_value
+                result = left_value + right_value
             # Strings
             elif isinstance(left_value, str) and isinstance(right_value, str):
-                return left_value + right_value
+                result = left_value + right_value
             else:
-                print(f"ERROR: Incompatible types for '+': {type(left_value)} and {type(right_value)}")
+                self.runtime_error(f"Incompatible types for '+': {type(left_value)} and {type(right_value)}")
+                return None
         
         elif op == '-':
             if isinstance(left_value, (int, float)) and isinstance(right_value, (int, float)):
-                return left_value - right_value
+                result = left_value - right_value
             else:
-                print(f"ERROR: Incompatible types for '-': {type(left_value)} and {type(right_value)}")
+                self.runtime_error(f"Incompatible types for '-': {type(left_value)} and {type(right_value)}")
+                return None
         
         elif op == '*':
             if isinstance(left_value, (int, float)) and isinstance(right_value, (int, float)):
-                return left_value * right_value
+                result = left_value * right_value
             else:
-                print(f"ERROR: Incompatible types for '*': {type(left_value)} and {type(right_value)}")
+                self.runtime_error(f"Incompatible types for '*': {type(left_value)} and {type(right_value)}")
+                return None
         
         elif op == '/':
             if isinstance(left_value, (int, float)) and isinstance(right_value, (int, float)):
                 if right_value == 0:
-                    print("ERROR: Division by zero")
+                    self.runtime_error("Division by zero")
                     return None
-                return left_value / right_value
+                result = left_value / right_value
             else:
-                print(f"ERROR: Incompatible types for '/': {type(left_value)} and {type(right_value)}")
+                self.runtime_error(f"Incompatible types for '/': {type(left_value)} and {type(right_value)}")
+                return None
         
         elif op == '=':
             return left_value == right_value
@@ -122,9 +249,13 @@ class Interpreter:
             return bool(left_value) or bool(right_value)
         
         else:
-            print(f"ERROR: Unknown operator: {op}")
+            self.runtime_error(f"Unknown operator: {op}")
+            return None
         
-        return None
+        # Arithmetic results are new values, count them against the memory budget
+        if self.max_memory is not None:
+            self.allocate(sys.getsizeof(result))
+        return result
     
     def eval_if(self, stm):
         """Evaluates an if-then-else expression"""
@@ -141,6 +272,11 @@ class Interpreter:
         """Evaluates a let block, creating a new environment"""
         # Save the current global environment
         old_env = self.global_env.copy()
+        if self.metered:
+            if self.env_stats is not None:
+                self.record_env_copy('let', old_env)
+            if self.max_memory is not None:
+                self.allocate(sys.getsizeof(old_env))
         
         # Add new definitions to the global environment
         facts = stm['facts']
@@ -161,31 +297,37 @@ class Interpreter:
         
         # Look for the function in the global environment
         if func_name not in self.global_env:
-            print(f"ERROR: Undefined function: {func_name}")
+            self.runtime_error(f"Undefined function: {func_name}")
             return None
         
         func_def = self.global_env[func_name]
         
         # Check that it is a function
         if func_def.get('type') != 'func':
-            print(f"ERROR: {func_name} is not a function")
+            self.runtime_error(f"{func_name} is not a function")
             return None
         
         # Check number of arguments
         params = func_def.get('params', [])
         if len(args) != len(params):
-            print(f"ERROR: Function {func_name} expects {len(params)} arguments, but got {len(args)}")
+            self.runtime_error(f"Function {func_name} expects {len(params)} arguments, but got {len(args)}")
             return None
         
         # Save the current global environment
         old_env = self.global_env.copy()
         
+        # Budgets and instrumentation, skipped entirely for plain runs
+        if self.metered:
+            self.enter_call(func_name, old_env)
+        
         # Create a new environment with the function parameters
         new_env = {}
         for i, param in enumerate(params):
             param_name = param.get('id') if 'id' in param else param.get('id_func')
             arg_value = self.eval_statement(args[i])
             new_env[param_name] = {'type': 'val', 'name': param_name, 'stm': {'type': 'stm_value', 'value': arg_value}}
+        if self.metered and self.max_memory is not None:
+            self.allocate_bindings(new_env)
         
         # Update the global environment with the parameters
         self.global_env.update(new_env)
@@ -195,6 +337,8 @@ class Interpreter:
         
         # Restore the previous global environment
         self.global_env = old_env
+        if self.limited:
+            self.depth -= 1
         
         return result
 
@@ -0,0 +1,250 @@
+import hashlib
+import json
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import Scanner
+import Parser
+from Scanner import syntax_errors as lexical_errors
+from Parser import syntax_errors, main as parser_main
+
+# Default directory for the per-file cache of parsed units
+CACHE_DIR = '.unit_cache'
+
+# Version of the cache entry layout, bump it when the entries change shape
+CACHE_FORMAT = 1
+
+# Raised when the units of a program cannot be linked together
+class LinkError(Exception):
+    def __init__(self, errors):
+        self.errors = errors  # One message per problem found
+        super().__init__("\n".join(errors))
+
+def compile_unit(filename, data=None, report=None):
+    """Scans and parses one source file on its own (from data when it was already read).
+    Returns the unit: its file, facts, exec statement (if any) and errors"""
+    # Clear any previous errors
+    lexical_errors.clear()
+    syntax_errors.clear()
+
+    ast = parser_main(filename, quiet=True, report=report, data=data)
+    errors = sorted(lexical_errors + syntax_errors, key=lambda x: x[0])
+    if not ast and not errors:
+        errors = [(0, 0, f"Could not parse {filename}")]
+
+    unit = {'file': filename, 'facts': ast['facts'] if ast else {}, 'errors': errors}
+    if ast and 'stm' in ast:
+        unit['stm'] = ast['stm']
+    return unit
+
+def grammar_stamp():
+    """Hashes the cache format and the scanner and parser sources,
+    so units parsed with another grammar are not reused"""
+    digest = hashlib.sha256(str(CACHE_FORMAT).encode())
+    for module in (Scanner, Parser):
+        with open(module.__file__, 'rb') as source_file:
+            digest.update(source_file.read())
+    return digest.hexdigest()
+
+# Cache of parsed units, one JSON file per source file.
+# An entry is reused when it was built with the same grammar and the source
+# modification time is unchanged, or it changed but the content hash is still the same
+class UnitCache:
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.stamp = grammar_stamp()
+
+    def entry_path(self, filename):
+        key = hashlib.sha1(os.path.abspath(filename).encode()).hexdigest()
+        return os.path.join(self.cache_dir, key + '.json')
+
+    def lookup(self, filename):
+        """Returns the cached unit for filename, or None if it must be compiled again"""
+        try:
+            with open(self.entry_path(filename), 'r') as entry_file:
+                entry = json.load(entry_file)
+        except (OSError, ValueError):
+            return None
+        if entry.get('stamp') != self.stamp:
+            return None
+
+        # Entries are keyed by absolute path, errors must show the name used in this run
+        entry['unit']['file'] = filename
+
+        mtime = os.stat(filename).st_mtime_ns
+        if entry['mtime'] == mtime:
+            return entry['unit']
+
+        # The file was touched, only recompile if its content changed
+        if entry['hash'] != file_hash(filename):
+            return None
+        entry['mtime'] = mtime
+        self.write_entry(filename, entry)
+        return entry['unit']
+
+    def store(self, filename, unit, mtime, content_hash):
+        """Saves a freshly compiled unit, with the mtime and hash of the content it was compiled from"""
+        entry = {
+            'stamp': self.stamp,
+            'mtime': mtime,
+            'hash': content_hash,
+            'unit': unit
+        }
+        self.write_entry(filename, entry)
+
+    def write_entry(self, filename, entry):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Write to a temporary file with a unique name first, so a reader never sees a
+        # partial entry and builds sharing the cache directory do not clobber each other
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as entry_file:
+                json.dump(entry, entry_file)
+            os.replace(temp_path, self.entry_path(filename))
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+def file_hash(filename):
+    with open(filename, 'rb') as source_file:
+        return hashlib.sha256(source_file.read()).hexdigest()
+
+def build(filenames, cache_dir=CACHE_DIR, jobs=None, report=None):
+    """Compiles the units that are not cached, in parallel when there are several.
+    With a MemoryReport the units are compiled serially in this process, so the
+    scan and parse phases of every unit can be traced.
+    Returns (units, compiled, cached), units in the order of filenames, compiled the
+    files that had to be scanned and parsed again and cached the files reused from the cache"""
+    cache = UnitCache(cache_dir)
+    units = {}
+    missing = []
+    cached = []
+    for filename in filenames:
+        if not os.path.exists(filename):
+            units[filename] = {'file': filename, 'facts': {}, 'errors': [(0, 0, f"File not found: {filename}")]}
+            continue
+        unit = cache.lookup(filename)
+        if unit is None:
+            missing.append(filename)
+        else:
+            units[filename] = unit
+            cached.append(filename)
+
+    if missing:
+        # Each file is read once: the unit is compiled from the same content that
+        # is hashed, and the mtime is taken before reading, so an edit made during
+        # the build is seen as a change on the next one
+        sources = {}
+        for filename in missing:
+            mtime = os.stat(filename).st_mtime_ns
+            with open(filename, 'rb') as source_file:
+                content = source_file.read()
+            sources[filename] = (mtime, hashlib.sha256(content).hexdigest(), content.decode())
+
+        # The first unit is compiled here, which also generates the parser tables
+        # before the worker processes need them
+        units[missing[0]] = compile_unit(missing[0], sources[missing[0]][2], report)
+        rest = missing[1:]
+        texts = [sources[filename][2] for filename in rest]
+        if report is not None:
+            for filename, text in zip(rest, texts):
+                units[filename] = compile_unit(filename, text, report)
+        elif len(rest) > 1 and jobs != 1:
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                for filename, unit in zip(rest, pool.map(compile_unit, rest, texts)):
+                    units[filename] = unit
+        else:
+            for filename, text in zip(rest, texts):
+                units[filename] = compile_unit(filename, text)
+
+        for filename in missing:
+            mtime, content_hash, _ = sources[filename]
+            cache.store(filename, units[filename], mtime, content_hash)
+
+    return [units[filename] for filename in filenames], missing, cached
+
+def link(units):
+    """Merges the facts of all units into one program for Interpreter.interpret.
+    Raises LinkError for duplicate definitions, several exec lines or undefined names"""
+    errors = []
+    facts = {}
+    defined_in = {}
+    program = {}
+    exec_file = None
+
+    for unit in units:
+        for name, fact in unit['facts'].items():
+            if name in facts:
+                errors.append(f"Duplicate definition of '{name}' in {unit['file']} (first defined in {defined_in[name]})")
+                continue
+            facts[name] = fact
+            defined_in[name] = unit['file']
+        if 'stm' in unit:
+            if exec_file:
+                errors.append(f"Second exec line in {unit['file']} (first one in {exec_file})")
+                continue
+            program['stm'] = unit['stm']
+            exec_file = unit['file']
+
+    # The interpreter scopes names dynamically (a function sees the parameters and
+    # let facts of its callers), so a name is only missing when nothing in the
+    # whole program defines it
+    defined = set(facts)
+    used = {}  # Name -> where it is first used
+    for name, fact in facts.items():
+        for used_name in collect_names(fact, defined):
+            used.setdefault(used_name, f"'{name}' ({defined_in[name]})")
+    if 'stm' in program:
+        for used_name in collect_names(program['stm'], defined):
+            used.setdefault(used_name, f"exec line ({exec_file})")
+    for used_name, where in used.items():
+        if used_name not in defined:
+            errors.append(f"Undefined name '{used_name}' used in {where}")
+
+    if errors:
+        raise LinkError(errors)
+    program['facts'] = facts
+    return program
+
+def collect_names(node, defined):
+    """Returns the names referenced in node, and adds the names that
+    function parameters and let facts inside node define to defined"""
+    used = []
+    # Iterative walk, deep ASTs would overflow the stack with recursion
+    pending = [node]
+    while pending:
+        node = pending.pop()
+        node_type = node.get('type')
+
+        if node_type == 'stm_id':
+            used.append(node['id'])
+
+        elif node_type == 'id_func':
+            used.append(node['id_func'])
+
+        elif node_type == 'stm_func_call':
+            used.append(node['id_func'])
+            pending.extend(node['args'])
+
+        elif node_type == 'stm_op':
+            pending.append(node['value1'])
+            pending.append(node['value2'])
+
+        elif node_type == 'stm_if':
+            pending.append(node['condition'])
+            pending.append(node['then_stm'])
+            pending.append(node['else_stm'])
+
+        elif node_type == 'stm_let':
+            defined.update(node['facts'])
+            pending.extend(node['facts'].values())
+            pending.append(node['stm'])
+
+        elif node_type == 'func':
+            defined.update(param.get('id') if 'id' in param else param.get('id_func') for param in node['params'])
+            pending.append(node['stm'])
+
+        elif node_type == 'val':
+            pending.append(node['stm'])
+
+    return used
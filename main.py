@@ -2,54 +2,236 @@ from Scanner import lexer  # Import lexer from Scanner
 import ply.yacc as yacc
 from Scanner import syntax_errors as lexical_errors
 from Parser import syntax_errors, main as parser_main  # Import from our improved parser
-from interpreter import Interpreter
+from interpreter import Interpreter, ExecutionLimitError
+from instrumentation import MemoryReport, ast_stats
+from linker import build, link, LinkError, CACHE_DIR
+import argparse
 import json
 import sys
 
-def main():
+# Output modes
+# result: only the program output is printed
+# diagnostics: phase progress and errors are printed, but not the AST or the output
+# full: progress, errors, the AST and the program output are printed
+MODES = ('result', 'diagnostics', 'full')
+
+# Exit status returned by each phase (and by the program as a whole)
+EXIT_OK = 0
+EXIT_SYNTAX_ERROR = 1  # Lexical or syntax errors, the interpreter did not run
+EXIT_AST_FAILED = 2    # The parser did not produce an AST
+EXIT_RUNTIME_ERROR = 3 # The interpreter reported or raised an error
+EXIT_LIMIT_EXCEEDED = 4 # The interpreter went over one of its execution budgets
+EXIT_LINK_ERROR = 5    # The units of a multi-file program could not be linked
+
+def write_ast(ast, out):
+    """Streams the AST as indented JSON to a file object, chunk by chunk,
+    instead of building the whole document as one string"""
+    for chunk in json.JSONEncoder(indent=2).iterencode(ast):
+        out.write(chunk)
+    out.write("\n")
+
+def write_report(report, report_format, path, mode):
+    """Prints the memory report, or writes it to path"""
+    text = json.dumps(report.to_dict(), indent=2) if report_format == 'json' else report.format()
+    if path:
+        with open(path, 'w') as report_file:
+            report_file.write(text + "\n")
+    else:
+        # In result mode the report goes to stderr so stdout only carries the output
+        print(text, file=sys.stderr if mode == 'result' else sys.stdout)
+
+def run_parser(filename, mode, report=None):
+    """Scans and parses the source file. Returns (status, ast)"""
     # Clear any previous errors
     lexical_errors.clear()
     syntax_errors.clear()
-    
+
     # Run the parser main function to parse and check for syntax errors
-    ast = parser_main()
-    
+    ast = parser_main(filename, quiet=(mode != 'full'), report=report)
+
     # If there were syntax errors, exit without interpreting
     if syntax_errors or lexical_errors:
+        # In result mode errors go to stderr so stdout only carries the output
+        out = sys.stderr if mode == 'result' else sys.stdout
         seen = set()
-        print("\n---------------------------------------------------------------")
+        print("\n---------------------------------------------------------------", file=out)
         # Sort errors by line number for clearer output
         all_errors = lexical_errors + syntax_errors
         for line, _, msg in sorted(all_errors, key=lambda x: x[0]):
             # Only show one error per line to avoid overwhelming the user
             if line not in seen:
-                print(f"- {msg}")
+                print(f"- {msg}", file=out)
                 seen.add(line)
-        print(f"\n\033[91mSYNTAX ERRORS DETECTED. Interpreter will not run.\033[0m")
-        print("----------------------------------------------------------------\n")
-        return
-        
-    # If the AST is valid, proceed with execution
-    if ast:
-        # Print the AST in a readable format
-        print("-----------------------------------------------------\nAbstract Syntax Tree")
-        print(json.dumps(ast, indent=2))
-        
-        # Create an interpreter and run it
-        try:
-            interpreter = Interpreter()
+        print(f"\n\033[91mSYNTAX ERRORS DETECTED. Interpreter will not run.\033[0m", file=out)
+        print("----------------------------------------------------------------\n", file=out)
+        return EXIT_SYNTAX_ERROR, None
+
+    if not ast:
+        out = sys.stderr if mode == 'result' else sys.stdout
+        print("\n-----------------------------------------------------", file=out)
+        print(f"\n\033[91mAST creation failed. Interpreter will not run.\033[0m", file=out)
+        print("-----------------------------------------------------\n", file=out)
+        return EXIT_AST_FAILED, None
+
+    if mode == 'diagnostics':
+        print(f"Parsing: OK ({len(ast.get('facts', {}))} top-level facts)")
+    return EXIT_OK, ast
+
+def run_build(filenames, mode, jobs=None, cache_dir=CACHE_DIR, report=None):
+    """Compiles each source file as a separate unit (reusing cached units)
+    and links them into one program. Returns (status, ast)"""
+    out = sys.stderr if mode == 'result' else sys.stdout
+    # With a memory report the units are compiled serially, and each one adds to the scan and parse phases
+    units, compiled, cached = build(filenames, cache_dir, jobs, report)
+    if report is not None:
+        report.extra['compiled units'] = len(compiled)
+        report.extra['cached units'] = len(cached)
+    if mode != 'result':
+        print(f"Build: {len(units)} units ({len(compiled)} compiled, {len(cached)} cached)")
+
+    # Report the syntax errors of every unit before linking
+    failed = [unit for unit in units if unit['errors']]
+    if failed:
+        print("\n---------------------------------------------------------------", file=out)
+        for unit in failed:
+            seen = set()
+            for line, _, msg in unit['errors']:
+                # Only show one error per line to avoid overwhelming the user
+                if line not in seen:
+                    print(f"- {unit['file']}: {msg}", file=out)
+                    seen.add(line)
+        print(f"\n\033[91mSYNTAX ERRORS DETECTED. Interpreter will not run.\033[0m", file=out)
+        print("----------------------------------------------------------------\n", file=out)
+        return EXIT_SYNTAX_ERROR, None
+
+    try:
+        if report is None:
+            ast = link(units)
+        else:
+            with report.phase('link'):
+                ast = link(units)
+    except LinkError as e:
+        print("\n---------------------------------------------------------------", file=out)
+        for msg in e.errors:
+            print(f"- {msg}", file=out)
+        print(f"\n\033[91mLINK ERRORS DETECTED. Interpreter will not run.\033[0m", file=out)
+        print("----------------------------------------------------------------\n", file=out)
+        return EXIT_LINK_ERROR, None
+
+    if mode == 'diagnostics':
+        print(f"Linking: OK ({len(ast['facts'])} top-level facts)")
+    return EXIT_OK, ast
+
+def run_interpreter(ast, mode, budgets=None, report=None):
+    """Executes the AST within the given budgets. Returns (status, output)"""
+    interpreter = Interpreter(**(budgets or {}), track_env=report is not None)
+    try:
+        if mode == 'full':
             print("\n-----------------------------------------------------\nProgram Execution outputs: ")
+        if report is None:
             output = interpreter.interpret(ast)
-            print(f"Output: {output}")
-            print(f"\033[92mInterpreter Execution Complete\033[0m\n-----------------------------------------------------\n")
-        except Exception as e:
-            print(f"\nRUNTIME ERROR: {str(e)}")
+        else:
+            try:
+                with report.phase('interpret'):
+                    output = interpreter.interpret(ast)
+            finally:
+                report.env = interpreter.env_stats
+    except ExecutionLimitError as e:
+        out = sys.stderr if mode == 'result' else sys.stdout
+        print(f"\nLIMIT EXCEEDED: {e.message}", file=out)
+        if mode != 'result':
+            # The counters only run when the run has budgets
+            if interpreter.limited:
+                profile = e.profile
+                print(f"- steps: {profile['steps']}")
+                print(f"- peak call depth: {profile['peak_depth']}")
+                print(f"- elapsed: {profile['elapsed']:.3f}s")
+                print(f"- allocated: {profile['allocated_bytes']} bytes")
+            print(f"\n\033[91mInterpreter Execution stopped\033[0m\n-----------------------------------------------------\n")
+        return EXIT_LIMIT_EXCEEDED, None
+    except Exception as e:
+        interpreter.runtime_errors.append(str(e))
+
+    # Runtime errors recorded by the interpreter (or raised from it) fail the run
+    if interpreter.runtime_errors:
+        out = sys.stderr if mode == 'result' else sys.stdout
+        for msg in interpreter.runtime_errors:
+            print(f"RUNTIME ERROR: {msg}", file=out)
+        if mode != 'result':
             print(f"\n\033[91mInterpreter Execution failed\033[0m\n-----------------------------------------------------\n")
+        return EXIT_RUNTIME_ERROR, None
+
+    if mode == 'full':
+        print(f"Output: {output}")
+        print(f"\033[92mInterpreter Execution Complete\033[0m\n-----------------------------------------------------\n")
+    elif mode == 'result':
+        print(output)
+    else:
+        print("Execution: OK")
+    return EXIT_OK, output
+
+def positive_int(value):
+    """argparse type for counts that must be at least 1"""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be a positive integer, got {value}")
+    return number
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Scan, parse and interpret a program.")
+    arg_parser.add_argument('sources', nargs='*', default=['Program_Test.txt'],
+                            help="source files to run (default: Program_Test.txt), "
+                                 "several files are compiled as separate cached units and linked")
+    arg_parser.add_argument('--mode', choices=MODES, default='full',
+                            help="what to print (default: full)")
+    arg_parser.add_argument('--ast-out', metavar='PATH',
+                            help="stream the AST as JSON to PATH ('-' for stdout)")
+    arg_parser.add_argument('--max-steps', type=int, help="maximum number of evaluated statements")
+    arg_parser.add_argument('--max-depth', type=int, help="maximum function call depth")
+    arg_parser.add_argument('--max-time', type=float, help="maximum execution time in seconds")
+    arg_parser.add_argument('--max-memory', type=int, help="maximum approximate bytes of created values and environment copies")
+    arg_parser.add_argument('--memory-report', choices=('text', 'json'),
+                            help="measure memory per phase with tracemalloc and print a report")
+    arg_parser.add_argument('--memory-report-out', metavar='PATH',
+                            help="write the memory report to PATH instead of printing it")
+    arg_parser.add_argument('--jobs', type=positive_int,
+                            help="number of processes used to compile units (default: one per CPU)")
+    arg_parser.add_argument('--cache-dir', default=CACHE_DIR,
+                            help=f"directory for cached units (default: {CACHE_DIR})")
+    args = arg_parser.parse_args(argv)
+    budgets = {
+        'max_steps': args.max_steps,
+        'max_depth': args.max_depth,
+        'max_time': args.max_time,
+        'max_memory': args.max_memory
+    }
+
+    report = MemoryReport() if args.memory_report or args.memory_report_out else None
+
+    if len(args.sources) == 1:
+        status, ast = run_parser(args.sources[0], args.mode, report)
     else:
-        print("\n-----------------------------------------------------")
-        print(f"\n\033[91mAST creation failed. Interpreter will not run.\033[0m")
-        print("-----------------------------------------------------\n")
+        status, ast = run_build(args.sources, args.mode, args.jobs, args.cache_dir, report)
+    if status == EXIT_OK:
+        if report is not None:
+            report.ast = ast_stats(ast)
+
+        # The AST is only serialized when it was asked for
+        if args.ast_out == '-' or (args.mode == 'full' and not args.ast_out):
+            if args.mode == 'full':
+                print("-----------------------------------------------------\nAbstract Syntax Tree")
+            write_ast(ast, sys.stdout)
+        elif args.ast_out:
+            with open(args.ast_out, 'w') as ast_file:
+                write_ast(ast, ast_file)
+
+        status, _ = run_interpreter(ast, args.mode, budgets, report)
+
+    # The report is written even when a phase failed, with the phases that ran
+    if report is not None:
+        write_report(report, args.memory_report or 'json', args.memory_report_out, args.mode)
+    return status
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    sys.exit(main())
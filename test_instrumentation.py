@@ -0,0 +1,105 @@
+import tracemalloc
+import unittest
+from Scanner import syntax_errors as lexical_errors
+from Parser import syntax_errors, main as parser_main
+from interpreter import Interpreter
+from instrumentation import MemoryReport, ast_stats
+from test_interpreter import FIBONACCI
+
+def parse(source, report=None):
+    """Parses source text, returns the AST and the lexical and syntax errors"""
+    lexical_errors.clear()
+    ast = parser_main('<test>', quiet=True, report=report, data=source)
+    return ast, sorted(lexical_errors + syntax_errors)
+
+class PhaseTests(unittest.TestCase):
+    def test_phase_starts_and_stops_tracing(self):
+        report = MemoryReport()
+        with report.phase('work'):
+            self.assertTrue(tracemalloc.is_tracing())
+            data = [bytes(1000) for _ in range(100)]
+        self.assertFalse(tracemalloc.is_tracing())
+        self.assertGreater(report.phases['work']['peak'], 100000)
+        self.assertGreater(report.phases['work']['retained'], 100000)
+        del data
+
+    def test_phase_leaves_existing_tracing_on(self):
+        tracemalloc.start()
+        try:
+            with MemoryReport().phase('work'):
+                pass
+            self.assertTrue(tracemalloc.is_tracing())
+        finally:
+            tracemalloc.stop()
+
+    def test_repeated_phase_keeps_highest_peak_and_total_retained(self):
+        report = MemoryReport()
+        kept = []
+        with report.phase('unit'):
+            kept.append(bytes(200000))
+        first = dict(report.phases['unit'])
+        with report.phase('unit'):
+            kept.append(bytes(50000))
+        self.assertEqual(report.phases['unit']['peak'], first['peak'])
+        self.assertGreater(report.phases['unit']['retained'], first['retained'] + 40000)
+
+class AstStatsTests(unittest.TestCase):
+    def test_counts_nodes_by_type(self):
+        ast, _ = parse('func F[x] := x + 1 end\nexec F[2]')
+        stats = ast_stats(ast)
+        counts = {node_type: entry['count'] for node_type, entry in stats['by_type'].items()}
+        self.assertEqual(counts, {
+            'program': 1, 'facts': 1, 'func': 1, 'id': 1, 'stm_op': 1,
+            'stm_id': 1, 'stm_value': 2, 'stm_func_call': 1
+        })
+        self.assertEqual(stats['nodes'], 9)
+        self.assertEqual(stats['bytes'], sum(entry['bytes'] for entry in stats['by_type'].values()))
+
+    def test_fact_named_type(self):
+        ast, _ = parse('val type := 1 end\nexec type + 1')
+        self.assertEqual(ast_stats(ast)['by_type']['facts']['count'], 1)
+
+    def test_let_fact_named_type(self):
+        ast, _ = parse('exec let val type := 2 end in type * 3 end')
+        stats = ast_stats(ast)
+        self.assertEqual(stats['by_type']['facts']['count'], 2)
+        self.assertEqual(stats['by_type']['stm_let']['count'], 1)
+
+class ReportParseTests(unittest.TestCase):
+    def test_report_path_gives_the_same_ast(self):
+        report = MemoryReport()
+        self.assertEqual(parse(FIBONACCI, report), parse(FIBONACCI))
+        self.assertEqual(set(report.phases), {'scan', 'parse'})
+        self.assertGreater(report.extra['tokens'], 0)
+
+    def test_report_path_gives_the_same_errors(self):
+        source = 'func F[x] := x + end\nval y := 1 $ end\nexec F[1]'
+        plain = parse(source)
+        self.assertTrue(plain[1])
+        self.assertEqual(parse(source, MemoryReport()), plain)
+
+    def test_tokens_add_up_across_units(self):
+        report = MemoryReport()
+        parse('exec 1', report)
+        parse('exec 1 + 2', report)
+        self.assertEqual(report.extra['tokens'], 6)
+
+class EnvStatsTests(unittest.TestCase):
+    def test_env_copies_are_counted(self):
+        ast, _ = parse(FIBONACCI)
+        interpreter = Interpreter(track_env=True)
+        self.assertEqual(interpreter.interpret(ast), 354224848179261915075)
+        self.assertEqual(interpreter.env_stats['function_call']['copies'], 102)
+        self.assertEqual(interpreter.env_stats['let']['copies'], 1)
+        self.assertGreater(interpreter.env_stats['function_call']['bytes'], 0)
+        self.assertGreaterEqual(interpreter.env_stats['function_call']['peak_entries'], 5)
+
+    def test_env_copies_are_not_tracked_by_default(self):
+        ast, _ = parse(FIBONACCI)
+        interpreter = Interpreter()
+        interpreter.interpret(ast)
+        self.assertIsNone(interpreter.env_stats)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+import sys
+import unittest
+from Scanner import syntax_errors as lexical_errors
+from Parser import main as parser_main
+from interpreter import Interpreter, ExecutionLimitError
+
+FIBONACCI = '''
+func Fibonacci[n] :=
+    let
+        func FibHelper[remaining, current, next] :=
+            if remaining = 0 then
+                current
+            else
+                FibHelper[remaining - 1, next, current + next]
+            end
+        end
+    in
+        FibHelper[n, 0, 1]
+    end
+end
+
+exec Fibonacci[100]
+'''
+
+# Counts down from n with one call per step
+COUNT_DOWN = '''
+func Count[n] := if n = 0 then 0 else Count[n - 1] end end
+exec Count[%d]
+'''
+
+# Recurses until something stops it
+ENDLESS = '''
+func Loop[n] := Loop[n + 1] end
+exec Loop[0]
+'''
+
+def parse(source):
+    """Parses source text into an AST"""
+    lexical_errors.clear()
+    ast = parser_main('<test>', quiet=True, data=source)
+    assert ast, "test program did not parse"
+    return ast
+
+class BudgetTests(unittest.TestCase):
+    def test_runs_without_budgets(self):
+        interpreter = Interpreter()
+        self.assertEqual(interpreter.interpret(parse(FIBONACCI)), 354224848179261915075)
+        self.assertEqual(interpreter.runtime_errors, [])
+        # Counters are off when there are no budgets
+        self.assertEqual(interpreter.steps, 0)
+        self.assertEqual(interpreter.calls, {})
+
+    def test_budgets_large_enough_do_not_change_the_result(self):
+        interpreter = Interpreter(max_steps=10**6, max_depth=1000, max_time=60, max_memory=10**8)
+        self.assertEqual(interpreter.interpret(parse(FIBONACCI)), 354224848179261915075)
+        self.assertEqual(interpreter.calls, {'Fibonacci': 1, 'FibHelper': 101})
+
+    def test_step_limit(self):
+        with self.assertRaises(ExecutionLimitError) as raised:
+            Interpreter(max_steps=100).interpret(parse(FIBONACCI))
+        self.assertEqual(raised.exception.limit, 'steps')
+        self.assertEqual(raised.exception.profile['steps'], 101)
+
+    def test_depth_limit(self):
+        with self.assertRaises(ExecutionLimitError) as raised:
+            Interpreter(max_depth=50).interpret(parse(COUNT_DOWN % 100))
+        self.assertEqual(raised.exception.limit, 'depth')
+        self.assertEqual(raised.exception.profile['peak_depth'], 51)
+        # The call that went over the limit is not counted
+        self.assertEqual(raised.exception.profile['calls'], {'Count': 50})
+
+    def test_time_limit(self):
+        # Wall time is checked every 1024 steps, the program runs far more than that
+        with self.assertRaises(ExecutionLimitError) as raised:
+            Interpreter(max_time=0).interpret(parse(FIBONACCI))
+        self.assertEqual(raised.exception.limit, 'time')
+        self.assertEqual(raised.exception.profile['steps'], 1024)
+
+    def test_memory_limit(self):
+        with self.assertRaises(ExecutionLimitError) as raised:
+            Interpreter(max_memory=2000).interpret(parse(COUNT_DOWN % 100))
+        self.assertEqual(raised.exception.limit, 'memory')
+        self.assertGreater(raised.exception.profile['allocated_bytes'], 2000)
+
+    def test_memory_counts_environment_copies(self):
+        interpreter = Interpreter(max_memory=10**8)
+        interpreter.interpret(parse(COUNT_DOWN % 50))
+        # Every call copies the environment and wraps its argument
+        self.assertGreater(interpreter.allocated, 51 * (sys.getsizeof({}) + 2 * sys.getsizeof({'type': 'val'})))
+
+    def test_recursion_error_becomes_limit_error(self):
+        with self.assertRaises(ExecutionLimitError) as raised:
+            Interpreter().interpret(parse(ENDLESS))
+        self.assertEqual(raised.exception.limit, 'depth')
+        # The RecursionError traceback is not kept alive by the limit error
+        self.assertIsNone(raised.exception.__context__)
+        self.assertIsNone(raised.exception.__cause__)
+
+    def test_recursion_error_profile_with_budgets(self):
+        with self.assertRaises(ExecutionLimitError) as raised:
+            Interpreter(max_steps=10**9).interpret(parse(ENDLESS))
+        self.assertEqual(raised.exception.limit, 'depth')
+        self.assertGreater(raised.exception.profile['peak_depth'], 0)
+        self.assertIsNone(raised.exception.__context__)
+
+    def test_runtime_errors_are_recorded(self):
+        interpreter = Interpreter()
+        self.assertIsNone(interpreter.interpret(parse('exec Nope[1]')))
+        self.assertEqual(interpreter.runtime_errors, ["Undefined function: Nope"])
+
+
+if __name__ == '__main__':
+    unittest.main()
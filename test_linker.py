@@ -0,0 +1,158 @@
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+import linker
+import main
+from linker import build, link, LinkError, UnitCache
+from interpreter import Interpreter
+
+class LinkerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.directory, 'cache')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, source):
+        """Writes a source file in the test directory and returns its path"""
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as source_file:
+            source_file.write(source)
+        return path
+
+    def build(self, *paths, **options):
+        return build(list(paths), self.cache_dir, **options)
+
+class LinkTests(LinkerTestCase):
+    def test_split_program_runs_like_one_file(self):
+        # G uses F's parameter x, which the interpreter allows through dynamic scoping
+        a = self.write('a.txt', 'func F[x] := G[1] end')
+        b = self.write('b.txt', 'func G[y] := x + y end\nexec F[41]')
+        units, _, _ = self.build(a, b)
+        self.assertEqual(Interpreter().interpret(link(units)), 42)
+
+    def test_let_facts_count_as_defined(self):
+        a = self.write('a.txt', 'func F[n] := let val k := n end in G[1] end end')
+        b = self.write('b.txt', 'func G[y] := k + y end\nexec F[2]')
+        units, _, _ = self.build(a, b)
+        self.assertEqual(Interpreter().interpret(link(units)), 3)
+
+    def test_duplicate_definition(self):
+        a = self.write('a.txt', 'func F[x] := x end')
+        b = self.write('b.txt', 'func F[y] := y end')
+        units, _, _ = self.build(a, b)
+        with self.assertRaises(LinkError) as raised:
+            link(units)
+        self.assertEqual(raised.exception.errors, [f"Duplicate definition of 'F' in {b} (first defined in {a})"])
+
+    def test_second_exec_line(self):
+        a = self.write('a.txt', 'func F[x] := x end\nexec F[1]')
+        b = self.write('b.txt', 'exec F[2]')
+        units, _, _ = self.build(a, b)
+        with self.assertRaises(LinkError) as raised:
+            link(units)
+        self.assertEqual(raised.exception.errors, [f"Second exec line in {b} (first one in {a})"])
+
+    def test_missing_names(self):
+        a = self.write('a.txt', 'func F[x] := G[x] + y end')
+        b = self.write('b.txt', 'exec F[1]')
+        units, _, _ = self.build(a, b)
+        with self.assertRaises(LinkError) as raised:
+            link(units)
+        self.assertEqual(sorted(raised.exception.errors), [
+            f"Undefined name 'G' used in 'F' ({a})",
+            f"Undefined name 'y' used in 'F' ({a})"
+        ])
+
+    def test_syntax_errors_stay_with_their_unit(self):
+        a = self.write('a.txt', 'func F[x] := x end')
+        b = self.write('b.txt', 'func G[y] := y + end')
+        units, _, _ = self.build(a, b)
+        self.assertEqual(units[0]['errors'], [])
+        self.assertTrue(units[1]['errors'])
+
+class CacheTests(LinkerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.a = self.write('a.txt', 'func F[x] := x end')
+        self.b = self.write('b.txt', 'exec F[1]')
+
+    def test_second_build_is_cached(self):
+        _, compiled, cached = self.build(self.a, self.b)
+        self.assertEqual((compiled, cached), ([self.a, self.b], []))
+        _, compiled, cached = self.build(self.a, self.b)
+        self.assertEqual((compiled, cached), ([], [self.a, self.b]))
+
+    def test_touched_file_with_same_content_is_cached(self):
+        self.build(self.a, self.b)
+        stat = os.stat(self.a)
+        os.utime(self.a, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        _, compiled, cached = self.build(self.a, self.b)
+        self.assertEqual((compiled, cached), ([], [self.a, self.b]))
+
+    def test_edited_file_is_compiled_again(self):
+        self.build(self.a, self.b)
+        self.write('a.txt', 'func F[x] := x + 1 end')
+        units, compiled, cached = self.build(self.a, self.b)
+        self.assertEqual((compiled, cached), ([self.a], [self.b]))
+        self.assertEqual(Interpreter().interpret(link(units)), 2)
+
+    def test_grammar_change_invalidates_cache(self):
+        self.build(self.a, self.b)
+        with mock.patch.object(linker, 'grammar_stamp', return_value='another grammar'):
+            _, compiled, cached = self.build(self.a, self.b)
+        self.assertEqual((compiled, cached), ([self.a, self.b], []))
+
+    def test_cached_unit_uses_the_name_of_this_run(self):
+        self.build(self.a, self.b)
+        cwd = os.getcwd()
+        os.chdir(self.directory)
+        try:
+            units, _, cached = self.build('a.txt', 'b.txt')
+        finally:
+            os.chdir(cwd)
+        self.assertEqual(cached, ['a.txt', 'b.txt'])
+        self.assertEqual([unit['file'] for unit in units], ['a.txt', 'b.txt'])
+
+    def test_concurrent_writers_share_the_cache_dir(self):
+        errors = []
+        def write_entries():
+            cache = UnitCache(self.cache_dir)
+            try:
+                for _ in range(200):
+                    cache.store(self.a, {'file': self.a, 'facts': {}, 'errors': []}, 0, '')
+            except Exception as e:
+                errors.append(e)
+        writers = [threading.Thread(target=write_entries) for _ in range(4)]
+        for writer in writers:
+            writer.start()
+        for writer in writers:
+            writer.join()
+        self.assertEqual(errors, [])
+        # Only the entry is left, no temporary files
+        self.assertEqual(os.listdir(self.cache_dir), [os.path.basename(UnitCache(self.cache_dir).entry_path(self.a))])
+
+    def test_jobs_must_be_positive(self):
+        c = self.write('c.txt', 'func G[x] := x end')
+        with contextlib.redirect_stderr(io.StringIO()) as err:
+            with self.assertRaises(SystemExit) as raised:
+                main.main([self.a, self.b, c, '--jobs', '0', '--cache-dir', self.cache_dir])
+        self.assertEqual(raised.exception.code, 2)
+        self.assertIn("--jobs: must be a positive integer", err.getvalue())
+
+    def test_parallel_build(self):
+        c = self.write('c.txt', 'func G[x] := F[x] * 2 end')
+        d = self.write('d.txt', 'func H[x] := G[x] + 1 end')
+        units, compiled, _ = self.build(self.a, c, d, jobs=2)
+        self.assertEqual(compiled, [self.a, c, d])
+        self.assertEqual(sorted(link(units)['facts']), ['F', 'G', 'H'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import contextlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import main
+
+class MainTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.directory, 'cache')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, source):
+        """Writes a source file in the test directory and returns its path"""
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as source_file:
+            source_file.write(source)
+        return path
+
+    def run_main(self, *argv):
+        """Runs main with argv, returns (status, stdout, stderr)"""
+        out, err = io.StringIO(), io.StringIO()
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+            status = main.main(list(argv))
+        return status, out.getvalue(), err.getvalue()
+
+class ModeTests(MainTestCase):
+    def test_result_mode_prints_only_the_value(self):
+        source = self.write('a.txt', 'func F[x] := x * 2 end\nexec F[21]')
+        status, out, err = self.run_main(source, '--mode', 'result')
+        self.assertEqual((status, out, err), (main.EXIT_OK, "42\n", ""))
+
+    def test_result_mode_errors_go_to_stderr(self):
+        source = self.write('a.txt', 'exec Nope[1]')
+        status, out, err = self.run_main(source, '--mode', 'result')
+        self.assertEqual(status, main.EXIT_RUNTIME_ERROR)
+        self.assertEqual(out, "")
+        self.assertIn("RUNTIME ERROR: Undefined function: Nope", err)
+
+    def test_diagnostics_mode_does_not_serialize_the_ast(self):
+        source = self.write('a.txt', 'func F[x] := x end\nexec F[1]')
+        with mock.patch.object(main, 'write_ast') as write_ast, \
+             mock.patch.object(main.json, 'dumps') as dumps:
+            status, out, _ = self.run_main(source, '--mode', 'diagnostics')
+        self.assertEqual(status, main.EXIT_OK)
+        write_ast.assert_not_called()
+        dumps.assert_not_called()
+        self.assertNotIn('"facts"', out)
+        self.assertIn("Execution: OK", out)
+
+    def test_ast_out_writes_valid_json(self):
+        source = self.write('a.txt', 'func F[x] := x + 1 end\nexec F[1]')
+        path = os.path.join(self.directory, 'ast.json')
+        status, out, _ = self.run_main(source, '--mode', 'result', '--ast-out', path)
+        self.assertEqual((status, out), (main.EXIT_OK, "2\n"))
+        with open(path) as ast_file:
+            ast = json.load(ast_file)
+        self.assertEqual(ast['facts']['F']['type'], 'func')
+        self.assertEqual(ast['stm']['type'], 'stm_func_call')
+
+    def test_ast_out_to_stdout(self):
+        source = self.write('a.txt', 'exec 1')
+        status, out, _ = self.run_main(source, '--mode', 'diagnostics', '--ast-out', '-')
+        self.assertEqual(status, main.EXIT_OK)
+        # The AST follows the parsing line
+        ast, _ = json.JSONDecoder().raw_decode(out, out.index('{'))
+        self.assertEqual(ast['stm']['value'], 1)
+
+class ExitStatusTests(MainTestCase):
+    def assertStatus(self, expected, *argv):
+        status, _, _ = self.run_main(*argv, '--mode', 'result')
+        self.assertEqual(status, expected)
+
+    def test_ok(self):
+        self.assertStatus(main.EXIT_OK, self.write('a.txt', 'exec 1 + 1'))
+
+    def test_syntax_error(self):
+        self.assertStatus(main.EXIT_SYNTAX_ERROR, self.write('a.txt', 'exec 1 +'))
+
+    def test_lexical_error(self):
+        self.assertStatus(main.EXIT_SYNTAX_ERROR, self.write('a.txt', 'exec 1 $ 1'))
+
+    def test_ast_failed(self):
+        self.assertStatus(main.EXIT_AST_FAILED, os.path.join(self.directory, 'missing.txt'))
+
+    def test_runtime_error_reported_by_the_interpreter(self):
+        self.assertStatus(main.EXIT_RUNTIME_ERROR, self.write('a.txt', 'exec Nope[1]'))
+
+    def test_runtime_error_raised_from_the_interpreter(self):
+        self.assertStatus(main.EXIT_RUNTIME_ERROR, self.write('a.txt', 'exec 1 + "a"'))
+
+    def test_limit_exceeded(self):
+        source = self.write('a.txt', 'func F[x] := x end\nexec F[1]')
+        self.assertStatus(main.EXIT_LIMIT_EXCEEDED, source, '--max-steps', '1')
+
+    def test_link_error(self):
+        a = self.write('a.txt', 'func F[x] := x end')
+        b = self.write('b.txt', 'func F[y] := y end\nexec F[1]')
+        self.assertStatus(main.EXIT_LINK_ERROR, a, b, '--cache-dir', self.cache_dir)
+
+    def test_multi_file_ok(self):
+        a = self.write('a.txt', 'func F[x] := x end')
+        b = self.write('b.txt', 'exec F[3]')
+        status, out, _ = self.run_main(a, b, '--mode', 'result', '--cache-dir', self.cache_dir)
+        self.assertEqual((status, out), (main.EXIT_OK, "3\n"))
+
+
+if __name__ == '__main__':
+    unittest.main()